@@ -1,33 +1,120 @@
-from flask import Flask, request, jsonify, render_template
+from flask import (
+    Flask, Response, g, request, render_template, stream_with_context
+)
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import (
     JWTManager, create_access_token,
-    jwt_required, get_jwt
+    jwt_required, get_jwt, get_jwt_identity
 )
-from werkzeug.security import generate_password_hash, check_password_hash
-from flasgger import Swagger
-from datetime import timedelta
+from werkzeug.security import check_password_hash
+from sqlalchemy import delete, event, func, insert, inspect, select, text, update
+from cachetools import TTLCache, TLRUCache
+from datetime import datetime, timedelta, timezone
 from functools import wraps
-import re
+from hashlib import blake2b
+from validation import get_str, validate_email, validate_password
+import atexit
+import bcrypt
+import orjson
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Password hashing (bcrypt, cost can be raised by ops without code changes)
+BCRYPT_COST = int(os.getenv("BCRYPT_COST", "12"))
+
+
+def _password_bytes(password):
+    # bcrypt only uses the first 72 bytes of a password
+    return password.encode()[:72]
+
+
+def hash_password(password):
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(BCRYPT_COST)).decode()
+
+
+def verify_password(password_hash, password):
+    # Returns (is_valid, needs_rehash).
+    # Older Werkzeug hashes are still accepted and get upgraded on next login.
+    if password_hash.startswith("$2"):
+        is_valid = bcrypt.checkpw(_password_bytes(password), password_hash.encode())
+        return is_valid, is_valid and int(password_hash[4:6]) < BCRYPT_COST
+
+    is_valid = check_password_hash(password_hash, password)
+    return is_valid, is_valid
+
+
+# Checked against when the email is unknown, so failed logins take the
+# same time whether or not the account exists
+_DUMMY_HASH = hash_password("x" * 16)
+
 
+# Verified JWT claims, keyed by a hash of the raw token.
+# Each entry expires together with the token's own "exp" claim.
+_jwt_cache = TLRUCache(
+    maxsize=10_000,
+    ttu=lambda _key, claims, now: claims.get("exp", now),
+    timer=time.time
+)
+_jwt_cache_lock = threading.Lock()
+
+
+class CachingJWTManager(JWTManager):
+    # Skips signature check and claim parsing for tokens seen before.
+    # Failed decodes raise before anything is stored, so they are never cached.
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = blake2b(encoded_token.encode(), digest_size=16).digest()
+        with _jwt_cache_lock:
+            claims = _jwt_cache.get(key)
+        if claims is not None:
+            return claims
+
+        claims = super()._decode_jwt_from_config(encoded_token)
+        with _jwt_cache_lock:
+            _jwt_cache[key] = claims
+        return claims
+
+
+# JSON provider backed by orjson, used by jsonify() and request.get_json().
+# Dates still go through Flask's default handler so the output format stays the same.
+# Output matches ojsonify(): keys in insertion order, no trailing newline.
+class OrjsonProvider(DefaultJSONProvider):
+    sort_keys = False
 
-# Simple helpers for validating user input
-def validate_email(email):
-    # Basic email format check
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    def _dumpb(self, obj, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
 
+    def dumps(self, obj, **kwargs):
+        return self._dumpb(obj, pretty="indent" in kwargs).decode()
 
-def validate_password(password):
-    # Keep password rule simple for this project
-    return len(password) >= 6
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Write orjson's bytes straight into the response body
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            self._dumpb(obj, pretty), mimetype=self.mimetype
+        )
 
 
 # Flask app setup
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Database config (SQLite by default, PostgreSQL if provided)
 db_url = os.getenv("DATABASE_URL", "sqlite:///users.db")
@@ -39,35 +126,102 @@ if db_url.startswith("postgres://"):
 app.config["SQLALCHEMY_DATABASE_URI"] = db_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Optional read replica, used for admin list queries
+replica_url = os.getenv("DATABASE_REPLICA_URL")
+if replica_url:
+    if replica_url.startswith("postgres://"):
+        replica_url = replica_url.replace("postgres://", "postgresql://", 1)
+    app.config["SQLALCHEMY_BINDS"] = {"replica": replica_url}
+
+# Connection pool sizing. Each worker process has its own pool, so the
+# defaults split one budget (DB_MAX_CONNECTIONS, kept under PostgreSQL's
+# stock max_connections of 100) across the workers gunicorn_conf.py
+# started; DB_POOL_SIZE and DB_MAX_OVERFLOW still override per worker.
+# SQLite keeps SQLAlchemy's own pool choice but may be used from any worker
+# thread.
+if db_url.startswith("sqlite"):
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "connect_args": {"check_same_thread": False}
+    }
+else:
+    db_workers = int(os.getenv("GUNICORN_WORKER_COUNT", "1"))
+    per_worker = max(int(os.getenv("DB_MAX_CONNECTIONS", "80")) // db_workers, 2)
+    pool_size = int(os.getenv("DB_POOL_SIZE", per_worker // 2))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": pool_size,
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", max(per_worker - pool_size, 0))),
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+        "pool_timeout": 10
+    }
+
 # JWT settings
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret-key")
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
 
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
+# Nothing reads ORM objects after commit, so skip expiring (and reloading) them
+db = SQLAlchemy(app, session_options={"expire_on_commit": False})
+jwt = CachingJWTManager(app)
+
+
+# SQLite: WAL lets readers and a writer work at the same time,
+# NORMAL sync avoids an fsync on every commit, and foreign keys are
+# enforced so a task can never point at a missing user
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+if db_url.startswith("sqlite"):
+    with app.app_context():
+        event.listen(db.engine, "connect", _set_sqlite_pragmas)
 
-# Swagger is used only for API testing/documentation
-swagger = Swagger(app)
+# Swagger is used only for API testing/documentation, so it is
+# imported only when asked for to keep worker startup light
+if os.getenv("ENABLE_SWAGGER") == "1":
+    from flasgger import Swagger
+    swagger = Swagger(app)
 
 
 # Logging setup
-logging.basicConfig(
-    filename="app.log",
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    force=True
-)
+# LOG_LEVEL=WARNING in production skips the per-request info lines entirely
+log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+log_formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+
+file_handler = logging.FileHandler("app.log")
+file_handler.setFormatter(log_formatter)
 
 # Also add console handler to see output
 console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
-logging.getLogger().addHandler(console_handler)
+console_handler.setFormatter(log_formatter)
+
+# Requests only put records on a queue; a background thread does the
+# actual file and console writes so disk I/O stays off the request path
+log_queue = queue.SimpleQueue()
+logging.basicConfig(
+    level=log_level,
+    format="%(message)s",
+    handlers=[QueueHandler(log_queue)],
+    force=True
+)
+log_listener = QueueListener(
+    log_queue, file_handler, console_handler, respect_handler_level=True
+)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 logging.info("Backend API server started")
 
 
 # Database models
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
 class User(db.Model):
     # Stores user login and role info
     id = db.Column(db.Integer, primary_key=True)
@@ -75,6 +229,12 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), default="user")
+    # Used (with the row count) to build ETags for the admin user list
+    updated_at = db.Column(db.DateTime, default=_utcnow, onupdate=_utcnow)
+
+    # lazy="raise" turns an accidental per-user task load (an N+1 query
+    # pattern) into an immediate error; load tasks explicitly instead.
+    tasks = db.relationship("Task", lazy="raise", passive_deletes=True)
 
 
 class Task(db.Model):
@@ -82,22 +242,154 @@ class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(200))
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    # delete_user and delete_all_users remove a user's tasks explicitly.
+    # ON DELETE CASCADE only exists on newly created schemas; init_db()
+    # does not add it to older ones, so it is never relied on.
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    # Used (with the row count) to build ETags for the task list
+    updated_at = db.Column(db.DateTime, default=_utcnow, onupdate=_utcnow)
+
+    # Every task query filters by owner, and update/delete also by id;
+    # the leading user_id column serves owner-only lookups too
+    __table_args__ = (db.Index("ix_task_user_id_id", "user_id", "id"),)
+
+
+# Create missing tables and bring databases made by older versions up to
+# date. create_all() never alters an existing table, so the columns and
+# index added since then are added here; safe to run on every start.
+def init_db():
+    with app.app_context():
+        db.create_all()
+        inspector = inspect(db.engine)
+        with db.engine.begin() as conn:
+            for model in (User, Task):
+                table = model.__table__
+                if "updated_at" in {c["name"] for c in inspector.get_columns(table.name)}:
+                    continue
+                preparer = conn.dialect.identifier_preparer
+                column_type = table.c.updated_at.type.compile(dialect=conn.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN updated_at {column_type}"
+                ))
+                conn.execute(update(table).values(updated_at=_utcnow()))
+            for index in Task.__table__.indexes:
+                index.create(conn, checkfirst=True)
+
+
+# Small in-process cache of login data, keyed by lowercased email.
+# Only the columns needed to check a password are kept: (id, password_hash, name).
+# Unknown emails are not cached, so a new signup can log in straight away.
+# Each gunicorn worker has its own copy and _forget_user() only clears the
+# one that handled the write, so other workers can serve an entry for up to
+# the TTL after a delete. Login therefore re-reads the role by primary key
+# (see _current_role) before issuing a token, so a stale entry can't log
+# in a deleted user or hand out an old role.
+_user_cache = TTLCache(maxsize=10_000, ttl=60)
+_user_cache_lock = threading.Lock()
+
+
+def _user_by_email(email):
+    with _user_cache_lock:
+        row = _user_cache.get(email)
+    if row is not None:
+        return row
+
+    row = db.session.execute(
+        select(User.id, User.password, User.name).where(User.email == email)
+    ).first()
+    if row is None:
+        return None
+
+    row = tuple(row)
+    with _user_cache_lock:
+        _user_cache[email] = row
+    return row
+
+
+def _current_role(user_id):
+    # Always from the database: None means the user has been deleted
+    return db.session.execute(select(User.role).where(User.id == user_id)).first()
+
+
+def _forget_user(email):
+    with _user_cache_lock:
+        _user_cache.pop(email, None)
+
+
+def _forget_all_users():
+    with _user_cache_lock:
+        _user_cache.clear()
+
+
+# Once any user exists the "first user becomes admin" answer never changes,
+# so we stop asking the database after the first positive result
+_any_user_exists = False
+_any_user_lock = threading.Lock()
+
+
+def _users_exist():
+    global _any_user_exists
+    if _any_user_exists:
+        return True
+
+    with _any_user_lock:
+        if not _any_user_exists:
+            _any_user_exists = db.session.query(User.id).first() is not None
+        return _any_user_exists
+
+
+def _mark_users_exist():
+    global _any_user_exists
+    _any_user_exists = True
+
+
+# API responses: one orjson call straight to response bytes
+def ojsonify(obj, status=200):
+    return app.response_class(orjson.dumps(obj), status=status, mimetype="application/json")
 
 
 # Admin-only route protection
+# The 403 body never changes, so it is built once
+_ADMIN_DENIED = (
+    orjson.dumps({"message": "Admin access required"}),
+    403,
+    {"Content-Type": "application/json"}
+)
+
+
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        claims = get_jwt()
+        # Claims are read once here and shared with the view through g
+        claims = g.claims = get_jwt()
         if claims.get("role") != "admin":
-            user_email = claims.get("email", "Unknown")
-            logging.warning(f"Unauthorized access attempt: {user_email} (user_id: {claims.get('id')}) tried to access admin endpoint")
-            return jsonify({"message": "Admin access required"}), 403
+            logging.warning("Unauthorized access attempt: %s (user_id: %s) tried to access admin endpoint", claims.get("email", "Unknown"), claims.get("id"))
+            return _ADMIN_DENIED
         return fn(*args, **kwargs)
     return wrapper
 
 
+# Cheap shape check on bearer tokens before any decoding happens.
+# A JWT has exactly three dot-separated parts, so anything else is
+# rejected here without paying for base64 decode and signature checks.
+MAX_TOKEN_LENGTH = 4096
+
+
+@app.before_request
+def reject_malformed_token():
+    if not request.path.startswith("/api/v1/") or request.path.startswith("/api/v1/auth/"):
+        return None
+
+    auth_header = request.headers.get("Authorization")
+    if auth_header is None:
+        return None
+
+    token = auth_header[7:] if auth_header.startswith("Bearer ") else ""
+    if not token or len(token) > MAX_TOKEN_LENGTH or token.count(".") != 2:
+        return ojsonify({"message": "Invalid token"}, 401)
+    return None
+
+
 # Frontend pages (used only to test APIs)
 @app.route("/")
 def home():
@@ -124,45 +416,47 @@ def dashboard():
 def register():
     data = request.get_json()
     logging.info(
-        f"Registration attempt for email: {data.get('email') if data else 'None'}"
+        "Registration attempt for email: %s", data.get("email") if data else None
     )
 
     if not data or not data.get("name") or not data.get("email") or not data.get("password"):
-        return jsonify({"message": "All fields are required"}), 400
+        return ojsonify({"message": "All fields are required"}, 400)
 
-    name = data.get("name", "").strip()
-    email = data.get("email", "").strip().lower()
-    password = data.get("password", "")
+    name = get_str(data, "name")
+    email = get_str(data, "email").lower()
+    password = get_str(data, "password", strip=False)
 
     if len(name) < 2:
-        return jsonify({"message": "Name must be at least 2 characters"}), 400
+        return ojsonify({"message": "Name must be at least 2 characters"}, 400)
 
     if not validate_email(email):
-        return jsonify({"message": "Invalid email format"}), 400
+        return ojsonify({"message": "Invalid email format"}, 400)
 
     if not validate_password(password):
-        return jsonify({"message": "Password must be at least 6 characters"}), 400
+        return ojsonify({"message": "Password must be at least 6 characters"}, 400)
 
-    if User.query.filter_by(email=email).first():
-        return jsonify({"message": "Email already exists"}), 400
+    if db.session.execute(select(User.id).where(User.email == email)).first():
+        return ojsonify({"message": "Email already exists"}, 400)
 
     # Hash password before saving
-    hashed_pw = generate_password_hash(password)
+    hashed_pw = hash_password(password)
 
     # First user becomes admin (for demo/testing)
-    role = "admin" if User.query.count() == 0 else "user"
+    role = "user" if _users_exist() else "admin"
 
     user = User(name=name, email=email, password=hashed_pw, role=role)
 
     try:
         db.session.add(user)
         db.session.commit()
-        logging.info(f"User registered: username={name}")
-        return jsonify({"message": "User registered successfully"}), 201
+        _mark_users_exist()
+        _forget_user(email)
+        logging.info("User registered: username=%s", name)
+        return ojsonify({"message": "User registered successfully"}, 201)
     except Exception as e:
         db.session.rollback()
-        logging.error(str(e))
-        return jsonify({"message": "Registration failed"}), 500
+        logging.error("%s", e)
+        return ojsonify({"message": "Registration failed"}, 500)
 
 
 # Login API
@@ -170,137 +464,222 @@ def register():
 def login_api():
     data = request.get_json()
     logging.info(
-        f"Login attempt for email: {data.get('email') if data else 'None'}"
+        "Login attempt for email: %s", data.get("email") if data else None
     )
 
     if not data or not data.get("email") or not data.get("password"):
-        return jsonify({"message": "Email and password required"}), 400
-
-    user = User.query.filter_by(email=data["email"]).first()
-
-    if not user or not check_password_hash(user.password, data["password"]):
-        logging.info(f"Login failed: Invalid credentials for {data.get('email')}")
-        return jsonify({"message": "Invalid credentials"}), 401
+        return ojsonify({"message": "Email and password required"}, 400)
+
+    # Emails are stored lowercased at registration
+    email = get_str(data, "email").lower()
+    password = get_str(data, "password", strip=False)
+    user = _user_by_email(email)
+    if user:
+        is_valid, needs_rehash = verify_password(user[1], password)
+    else:
+        verify_password(_DUMMY_HASH, password)
+        is_valid = needs_rehash = False
+
+    if not is_valid:
+        logging.info("Login failed: Invalid credentials for %s", data.get("email"))
+        return ojsonify({"message": "Invalid credentials"}, 401)
+
+    user_id, _, name = user
+    current = _current_role(user_id)
+    if current is None:
+        _forget_user(email)
+        logging.info("Login failed: user_id=%s no longer exists", user_id)
+        return ojsonify({"message": "Invalid credentials"}, 401)
+    role = current.role
+
+    # Upgrade old or weaker hashes now that we have the plain password
+    if needs_rehash:
+        try:
+            User.query.filter_by(id=user_id).update({"password": hash_password(password)})
+            db.session.commit()
+            _forget_user(email)
+        except Exception as e:
+            db.session.rollback()
+            logging.error("Password rehash failed for user_id=%s: %s", user_id, e)
 
     # Create JWT token with role info
     token = create_access_token(
-        identity=str(user.id),
+        identity=str(user_id),
         additional_claims={
-            "email": user.email,
-            "name": user.name,
-            "role": user.role,
-            "id": user.id
+            "email": email,
+            "name": name,
+            "role": role,
+            "id": user_id
         }
     )
 
-    logging.info(f"Login successful: username={user.name}")
-    logging.info(f"JWT issued for user_id={user.id}")
+    logging.info("Login successful: username=%s", name)
+    logging.info("JWT issued for user_id=%s", user_id)
 
-    return jsonify({
+    return ojsonify({
         "message": "Login successful",
         "token": token,
-        "role": user.role
-    }), 200
+        "role": role
+    })
+
+
+# Insert one or more tasks with a single Core INSERT ... RETURNING id.
+# Skips ORM unit-of-work bookkeeping; ids come back in the same order as rows.
+def _insert_tasks(rows):
+    return db.session.execute(
+        insert(Task).returning(Task.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
 
 
 # Create task
 @app.route("/api/v1/tasks", methods=["POST"])
 @jwt_required()
 def create_task():
-    claims = get_jwt()
-    user_id = claims.get("id")
-    user_email = claims.get("email")
+    user_id = int(get_jwt_identity())
 
     data = request.get_json()
 
     if not data:
-        return jsonify({"message": "Request body is required"}), 400
+        return ojsonify({"message": "Request body is required"}, 400)
 
-    title = data.get("title", "").strip()
-    description = data.get("description", "").strip()
+    title = get_str(data, "title")
+    description = get_str(data, "description")
 
     if not title:
-        return jsonify({"message": "Task title is required"}), 400
-
-    task = Task(title=title, description=description, user_id=user_id)
+        return ojsonify({"message": "Task title is required"}, 400)
 
     try:
-        db.session.add(task)
+        task_id = _insert_tasks([
+            {"title": title, "description": description, "user_id": user_id}
+        ])[0]
         db.session.commit()
-        logging.info(f"Task created: task_id={task.id} user_id={user_id}")
-        return jsonify({"message": "Task created", "id": task.id}), 201
+        logging.info("Task created: task_id=%s user_id=%s", task_id, user_id)
+        return ojsonify({"message": "Task created", "id": task_id}, 201)
     except Exception as e:
         db.session.rollback()
-        logging.error(f"Failed to create task for user {user_email}: {str(e)}")
-        return jsonify({"message": "Failed to create task"}), 500
+        logging.error("Failed to create task for user_id=%s: %s", user_id, e)
+        return ojsonify({"message": "Failed to create task"}, 500)
+
+
+# ETag for a list endpoint: the newest updated_at plus the row count changes
+# whenever a row is added, edited or removed, so polls can get a 304 after
+# one small aggregate query instead of re-reading and re-sending the list
+def _list_etag(*parts):
+    return blake2b(":".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
 
 
 # Get tasks for logged-in user
+TASK_STREAM_BATCH = 1000
+
+
 @app.route("/api/v1/tasks", methods=["GET"])
 @jwt_required()
 def get_tasks():
-    claims = get_jwt()
-    user_id = claims.get("id")
+    user_id = int(get_jwt_identity())
+
+    last_update, task_count = db.session.execute(
+        select(func.max(Task.updated_at), func.count()).where(Task.user_id == user_id)
+    ).one()
+    etag = _list_etag(user_id, last_update, task_count)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    # Plain column rows, fetched in batches so a user with many tasks
+    # never has the whole list in memory at once
+    stmt = (
+        select(Task.id, Task.title, Task.description)
+        .where(Task.user_id == user_id)
+        .execution_options(yield_per=TASK_STREAM_BATCH)
+    )
 
-    tasks = Task.query.filter_by(user_id=user_id).all()
+    def generate():
+        yield b"["
+        separator = b""
+        for batch in db.session.execute(stmt).partitions():
+            # One orjson call per batch; drop its [ ] so batches join into one array
+            yield separator + orjson.dumps([
+                {"id": r[0], "title": r[1], "description": r[2]}
+                for r in batch
+            ])[1:-1]
+            separator = b","
+        yield b"]"
 
-    return jsonify([
-        {"id": t.id, "title": t.title, "description": t.description}
-        for t in tasks
-    ]), 200
+    response = Response(stream_with_context(generate()), mimetype="application/json")
+    response.set_etag(etag)
+    return response
 
 
 # Update task
 @app.route("/api/v1/tasks/<int:task_id>", methods=["PUT"])
 @jwt_required()
 def update_task(task_id):
-    claims = get_jwt()
-    user_id = claims.get("id")
-    user_email = claims.get("email")
-    data = request.get_json()
-
-    task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
 
-    if not task:
-        logging.warning(f"Task update failed: task_id={task_id} not found or unauthorized access by {user_email}")
-        return jsonify({"message": "Task not found"}), 404
-
-    task.title = data.get("title", task.title)
-    task.description = data.get("description", task.description)
+    # Only overwrite the fields that were sent (null means "leave as is")
+    changes = {
+        key: data[key] for key in ("title", "description") if data.get(key) is not None
+    }
+    owned = (Task.id == task_id, Task.user_id == user_id)
 
     try:
+        # Ownership check lives in the WHERE clause, so one statement does it all.
+        # With nothing to change, only check that the task exists: an UPDATE
+        # would bump updated_at and invalidate the list ETag for no reason
+        if changes:
+            found = db.session.execute(update(Task).where(*owned).values(changes)).rowcount > 0
+        else:
+            found = db.session.execute(select(Task.id).where(*owned)).first() is not None
+
+        if not found:
+            db.session.rollback()
+            logging.warning("Task update failed: task_id=%s not found or unauthorized access by user_id=%s", task_id, user_id)
+            return ojsonify({"message": "Task not found"}, 404)
+
         db.session.commit()
-        logging.info(f"Task updated: task_id={task_id}, user_email={user_email}")
-        return jsonify({"message": "Task updated"}), 200
+        logging.info("Task updated: task_id=%s user_id=%s", task_id, user_id)
+        return ojsonify({"message": "Task updated"})
     except Exception as e:
         db.session.rollback()
-        logging.error(f"Failed to update task {task_id} for user {user_email}: {str(e)}")
-        return jsonify({"message": "Failed to update task"}), 500
+        logging.error("Failed to update task %s for user_id=%s: %s", task_id, user_id, e)
+        return ojsonify({"message": "Failed to update task"}, 500)
 
 
 # Delete task
 @app.route("/api/v1/tasks/<int:task_id>", methods=["DELETE"])
 @jwt_required()
 def delete_task(task_id):
-    claims = get_jwt()
-    user_id = claims.get("id")
-    user_email = claims.get("email")
+    user_id = int(get_jwt_identity())
 
-    task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+    try:
+        result = db.session.execute(
+            delete(Task).where(Task.id == task_id, Task.user_id == user_id)
+        )
 
-    if not task:
-        logging.warning(f"Task deletion failed: task_id={task_id} not found or unauthorized access by {user_email}")
-        return jsonify({"message": "Task not found"}), 404
+        if result.rowcount == 0:
+            db.session.rollback()
+            logging.warning("Task deletion failed: task_id=%s not found or unauthorized access by user_id=%s", task_id, user_id)
+            return ojsonify({"message": "Task not found"}, 404)
 
-    try:
-        db.session.delete(task)
         db.session.commit()
-        logging.info(f"Task deleted: task_id={task_id} user_id={user_id}")
-        return jsonify({"message": "Task deleted"}), 200
+        logging.info("Task deleted: task_id=%s user_id=%s", task_id, user_id)
+        return ojsonify({"message": "Task deleted"})
     except Exception as e:
         db.session.rollback()
-        logging.error(f"Failed to delete task {task_id} for user {user_email}: {str(e)}")
-        return jsonify({"message": "Failed to delete task"}), 500
+        logging.error("Failed to delete task %s for user_id=%s: %s", task_id, user_id, e)
+        return ojsonify({"message": "Failed to delete task"}, 500)
+
+
+# Extra execute() arguments that send a read to the replica, if one is set up
+def _replica_bind():
+    return {"bind": db.engines["replica"]} if replica_url else None
 
 
 # Admin: get all users
@@ -308,16 +687,28 @@ def delete_task(task_id):
 @jwt_required()
 @admin_required
 def get_all_users():
-    claims = get_jwt()
-    admin_email = claims.get("email")
-    
-    users = User.query.all()
-    logging.info(f"Admin retrieved all users: admin_email={admin_email}, user_count={len(users)}")
-
-    return jsonify([
-        {"id": u.id, "name": u.name, "email": u.email, "role": u.role}
-        for u in users
-    ]), 200
+    admin_email = g.claims.get("email")
+
+    last_update, user_count = db.session.execute(
+        select(func.max(User.updated_at), func.count(User.id)),
+        bind_arguments=_replica_bind()
+    ).one()
+    etag = _list_etag(last_update, user_count)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    rows = db.session.execute(
+        select(User.id, User.name, User.email, User.role),
+        bind_arguments=_replica_bind()
+    ).all()
+    logging.info("Admin retrieved all users: admin_email=%s, user_count=%s", admin_email, len(rows))
+
+    response = ojsonify([
+        {"id": r[0], "name": r[1], "email": r[2], "role": r[3]}
+        for r in rows
+    ])
+    response.set_etag(etag)
+    return response
 
 
 # Admin: delete a user
@@ -325,30 +716,61 @@ def get_all_users():
 @jwt_required()
 @admin_required
 def delete_user(user_id):
-    claims = get_jwt()
-    admin_email = claims.get("email")
+    admin_email = g.claims.get("email")
     
-    user = User.query.filter_by(id=user_id).first()
+    try:
+        # Delete the tasks explicitly in the same transaction: databases
+        # created before ON DELETE CASCADE was added would otherwise reject
+        # the user delete. RETURNING gives us the email and tells us
+        # whether the user existed
+        deleted_tasks = db.session.execute(
+            delete(Task).where(Task.user_id == user_id)
+        ).rowcount
+        user_email = db.session.execute(
+            delete(User).where(User.id == user_id).returning(User.email)
+        ).scalar()
+
+        if user_email is None:
+            db.session.rollback()
+            logging.warning("User deletion failed: user_id=%s not found, requested by admin %s", user_id, admin_email)
+            return ojsonify({"message": "User not found"}, 404)
+
+        db.session.commit()
+        _forget_user(user_email)
+        logging.info("User deleted: user_id=%s, user_email=%s, deleted_tasks=%s, admin=%s", user_id, user_email, deleted_tasks, admin_email)
+        return ojsonify({"message": "User deleted successfully"})
+    except Exception as e:
+        db.session.rollback()
+        logging.error("Failed to delete user %s requested by admin %s: %s", user_id, admin_email, e)
+        return ojsonify({"message": "Failed to delete user"}, 500)
+
 
-    if not user:
-        logging.warning(f"User deletion failed: user_id={user_id} not found, requested by admin {admin_email}")
-        return jsonify({"message": "User not found"}), 404
+# Admin: delete every user except the admin making the request
+@app.route("/api/v1/admin/users/delete-all", methods=["DELETE"])
+@jwt_required()
+@admin_required
+def delete_all_users():
+    admin_id = g.claims.get("id")
+    admin_email = g.claims.get("email")
 
     try:
-        task_count = Task.query.filter_by(user_id=user_id).count()
-        Task.query.filter_by(user_id=user_id).delete()
-        db.session.delete(user)
+        # Their tasks first, explicitly, so this also works on databases
+        # whose foreign key has no ON DELETE CASCADE
+        db.session.execute(delete(Task).where(Task.user_id != admin_id))
+        deleted_users = db.session.execute(
+            delete(User).where(User.id != admin_id)
+        ).rowcount
         db.session.commit()
-        logging.info(f"User deleted: user_id={user_id}, user_email={user.email}, deleted_tasks={task_count}, admin={admin_email}")
-        return jsonify({"message": "User deleted successfully"}), 200
+        _forget_all_users()
+        logging.info("All users deleted: deleted_users=%s, admin=%s", deleted_users, admin_email)
+        return ojsonify({"message": "All users deleted successfully"})
     except Exception as e:
         db.session.rollback()
-        logging.error(f"Failed to delete user {user_id} requested by admin {admin_email}: {str(e)}")
-        return jsonify({"message": "Failed to delete user"}), 500
+        logging.error("Failed to delete all users requested by admin %s: %s", admin_email, e)
+        return ojsonify({"message": "Failed to delete users"}, 500)
 
 
-# Start server
+# Start development server (use wsgi.py with Gunicorn in production)
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
+    init_db()
+    app.run(debug=os.getenv("FLASK_DEBUG") == "1")
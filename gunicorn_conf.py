@@ -0,0 +1,33 @@
+import multiprocessing
+import os
+
+
+# Gunicorn settings for production
+# Run with: gunicorn -c gunicorn_conf.py wsgi:app
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Common rule of thumb: two workers per core plus one
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# gevent workers let DB and network waits from many requests overlap.
+# Set GUNICORN_WORKER_CLASS=gthread to use plain threads instead.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = 1000
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+timeout = 30
+
+
+def post_fork(server, worker):
+    # Workers load the app after forking; tell it how many share the
+    # database connection budget (see DB_MAX_CONNECTIONS in app.py)
+    os.environ["GUNICORN_WORKER_COUNT"] = str(server.cfg.workers)
+
+    # psycopg2 waits on PostgreSQL in C code, which would block every
+    # greenlet in the worker. psycogreen makes those waits yield to gevent
+    # so other requests keep running while a query is in flight.
+    uses_postgres = os.getenv("DATABASE_URL", "").startswith(("postgres://", "postgresql"))
+    # Check the class actually in use, which -k or the config may override
+    if server.cfg.worker_class_str == "gevent" and uses_postgres:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
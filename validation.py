@@ -0,0 +1,44 @@
+import string
+
+
+# Simple helpers for validating user input.
+# Kept free of Flask/SQLAlchemy imports and fully typed so the module
+# can be compiled with mypyc (see README); app.py works the same either way.
+
+# Allowed characters for each part of an email address
+_EMAIL_LOCAL_OK: frozenset[str] = frozenset(string.ascii_letters + string.digits + "._%+-")
+_EMAIL_DOMAIN_OK: frozenset[str] = frozenset(string.ascii_letters + string.digits + ".-")
+_EMAIL_TLD_OK: frozenset[str] = frozenset(string.ascii_letters)
+
+
+def validate_email(email: str) -> bool:
+    # Basic email format check (local@domain.tld) in a single linear pass,
+    # so attacker-controlled input can't trigger regex backtracking
+    local, at, domain = email.partition("@")
+    if not at or not local:
+        return False
+
+    host, _, tld = domain.rpartition(".")
+    if not host or len(tld) < 2:
+        return False
+
+    return (
+        _EMAIL_LOCAL_OK.issuperset(local)
+        and _EMAIL_DOMAIN_OK.issuperset(host)
+        and _EMAIL_TLD_OK.issuperset(tld)
+    )
+
+
+def get_str(data: dict, key: str, strip: bool = True) -> str:
+    # One lookup, one type check, one strip; anything that isn't a string
+    # (missing, null, number, ...) comes back as "". Pass strip=False for
+    # values such as passwords where whitespace is significant.
+    value = data.get(key)
+    if not isinstance(value, str):
+        return ""
+    return value.strip() if strip else value
+
+
+def validate_password(password: str) -> bool:
+    # Keep password rule simple for this project
+    return len(password) >= 6
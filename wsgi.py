@@ -0,0 +1,3 @@
+# Entry point for WSGI servers, e.g.:
+#   gunicorn -c gunicorn_conf.py wsgi:app
+from app import app